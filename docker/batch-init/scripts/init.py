@@ -9,9 +9,13 @@ import uuid
 import shutil
 import re
 import json
+from contextlib import closing
 from pathlib import Path
 from enum import Enum
-from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from s3transfer.manager import TransferManager
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 class Task(Enum):
 	oneA = '1a'
@@ -26,10 +30,17 @@ class Initialize:
 	INTER_TA = { 'name': 'unrestricted', 'description': 'UNRESTRICTED'  }
 	NIST_TA3 = { 'name': 'nist-ta3', 'description': 'NIST TA3 RESTRICTED' }
 
+	# valid submission archive extensions
+	VALID_EXTENSIONS = ('.tar.gz', '.tgz', '.zip')
+
+	# number of concurrent s3 transfer requests, the client connection pool is sized to match
+	S3_MAX_CONCURRENCY = 32
+
 	# init instance attributes
 	def __init__(self, envs):
 
 		self.s3_submission_archive_path = envs['S3_SUBMISSION_ARCHIVE_PATH']
+		self.s3_submission_archive_ext = self._get_submission_extension()
 		self.aws_region = envs['AWS_DEFAULT_REGION']
 		self.aws_sns_topic = envs['AWS_SNS_TOPIC_ARN']
 		self.s3_validation_bucket = envs['S3_VALIDATION_BUCKET']
@@ -39,6 +50,17 @@ class Initialize:
 		self.batch_job_queue = envs['BATCH_JOB_QUEUE']
 		self.java_opts = envs['JAVA_OPTS']
 		self.session = boto3.session.Session(region_name=self.aws_region)
+		self.s3_client = self.session.client('s3', config=Config(max_pool_connections=self.S3_MAX_CONCURRENCY))
+
+		# multipart transfer settings shared by all s3 uploads and downloads
+		self.transfer_config = TransferConfig(
+			multipart_threshold=8 * 1024 * 1024,
+			multipart_chunksize=64 * 1024 * 1024,
+			max_concurrency=self.S3_MAX_CONCURRENCY,
+			use_threads=True)
+
+		# single transfer manager so all .ttl uploads share one bounded worker pool
+		self.transfer_manager = TransferManager(self.s3_client, self.transfer_config)
 
 		# set validation flags for different submission types
 		self.NIST['validation'] = envs['NIST_VALIDATION_FLAGS']
@@ -49,22 +71,30 @@ class Initialize:
 	def run(self):
 		""" Main method to run
 		"""
-		self._check_submission_extension()
+		try:
+			self._check_submission_extension()
+
+			stem = self._get_submission_stem()
+			logging.info("File stem for submission %s is %s", self.s3_submission_archive_path, stem)
 
-		stem = self._get_submission_stem()
-		logging.info("File stem for submission %s is %s", self.s3_submission_archive_path, stem)
+			# download / extract archive and return local directory
+			staging_dir = self._download_and_extract_submission_from_s3()
 
-		# download / extract archive and return local directory
-		staging_dir = self._download_and_extract_submission_from_s3()
+			# validate run id directory and return path
+			run_id_path = self._get_run_id_path(staging_dir)
 
-		# validate run id directory and return path
-		run_id_path = self._get_run_id_path(staging_dir)
+			# read the top level directories of the run id directory once for all structure checks
+			run_id_dirs = self._get_subdirectory_names(run_id_path)
 
-		# identify the task type for the submission
-		task = self._get_task_type(stem, run_id_path)
+			# identify the task type for the submission
+			task = self._get_task_type(stem, run_id_path, run_id_dirs)
 
-		# validate structure of submission and upload to S3 
-		jobs = self._validate_and_upload(run_id_path, task, stem)
+			# validate structure of submission and upload to S3
+			jobs = self._validate_and_upload(run_id_path, run_id_dirs, task, stem)
+
+		finally:
+			# stop the transfer manager worker threads even if validation or upload failed
+			self.transfer_manager.shutdown()
 
 		# print out enviornment variables that will be set during aws batch submission
 		if jobs:
@@ -75,8 +105,9 @@ class Initialize:
 		else:
 			logging.info("No AWS Batch jobs submitted for %s", self.s3_submission_archive_path)
 
-		# remove staing directory and downloaded submission
-		os.remove(Path(self.s3_submission_archive_path).name)
+		# remove staing directory and downloaded submission, only .zip submissions are downloaded
+		if os.path.exists(Path(self.s3_submission_archive_path).name):
+			os.remove(Path(self.s3_submission_archive_path).name)
 		shutil.rmtree(staging_dir)
 
 
@@ -129,6 +160,8 @@ class Initialize:
 		Submissions must be an archive of .zip, .tar.gz, or .tgz.
 
 		:raises ClientError: SQS client exception
+		:raises BotoCoreError: Error while streaming the submission from s3
+		:raises TarError: The streamed .tar.gz submission is truncated or invalid
 		:raises Exception: No turtle (TTL) files extracted from s3 submission
 		:returns: The directory of the extracted content
 		:rtype: str
@@ -141,34 +174,43 @@ class Initialize:
 		if not os.path.exists(uid):
 		    os.makedirs(uid)
 
-		s3_client = self.session.client('s3')
-
 		try:
-		    logging.info("Downloading %s from bucket %s", s3_object, s3_bucket)
-		    s3_client.download_file(s3_bucket, s3_object, file_name)
-		    logging.info("Extracting %s", file_name)
-
-		    # extract files
+		    # extract only the .ttl files, all other content is ignored by validation. The directories
+		    # of skipped members are still created so the structure checks see the full layout
 		    if file_ext == '.tgz' or file_ext == '.tar.gz':
-		        # extract the contents of the .tar.gz
-		        with tarfile.open(file_name) as tar:
-		            tar.extractall(uid)
+		        # stream the .tar.gz from s3 into the decoder so extraction runs while
+		        # downloading and the archive is never written to disk
+		        logging.info("Streaming %s from bucket %s", s3_object, s3_bucket)
+		        response = self.s3_client.get_object(Bucket=s3_bucket, Key=s3_object)
+
+		        # tarfile does not close a caller supplied fileobj, close the body to release the connection
+		        with closing(response['Body']) as body, tarfile.open(fileobj=body, mode='r|gz') as tar:
+		            for member in tar:
+		                if member.isfile() and member.name.endswith('.ttl'):
+		                    tar.extract(member, uid)
+		                else:
+		                    self._make_member_directory(uid, member.name, member.isdir())
 		    elif(file_ext == '.zip'):
-		        zip_ref = zipfile.ZipFile(file_name, 'r')
-		        zip_ref.extractall(uid)
-		        zip_ref.close()
-
-		    ttls_paths = (glob.glob(uid + '/**/*.ttl', recursive=True))
-		    ttls = [ Path(x).name for x in ttls_paths ]
+		        # zip archives require random access to the central directory, download first
+		        logging.info("Downloading %s from bucket %s", s3_object, s3_bucket)
+		        self.s3_client.download_file(s3_bucket, s3_object, file_name, Config=self.transfer_config)
+		        logging.info("Extracting %s", file_name)
+
+		        with zipfile.ZipFile(file_name, 'r') as zip_ref:
+		            for info in zip_ref.infolist():
+		                if not info.is_dir() and info.filename.endswith('.ttl'):
+		                    zip_ref.extract(info, uid)
+		                else:
+		                    self._make_member_directory(uid, info.filename, info.is_dir())
 
 		    # if no ttl files extracted raise an exception
-		    if len(ttls) <= 0 :
+		    if next(self._iter_ttl(uid), None) is None:
 		        err = "No files with .ttl extension found in S3 submission {0}".format(file_name)
 		        raise ValueError(err)
 
 		    return uid
 
-		except ClientError as e:
+		except (ClientError, BotoCoreError, tarfile.TarError) as e:
 		    logging.error(e)
 		    self._publish_init_failure(e)
 		    raise
@@ -178,27 +220,111 @@ class Initialize:
 		    raise
 
 
-	def _upload_file_to_s3(self, filepath, bucket, prefix=None):
-	    """Helper function to upload single file to S3 bucket with specified prefix
+	def _make_member_directory(self, directory, member_name, is_dir):
+		"""Helper function that will create the directory of an archive member that is not
+		extracted. For directory members the directory itself is created, otherwise its parent.
+		Members that would resolve outside of the extraction directory are ignored.
 
-	    :param str filepath: The local path of the file to be uploaded
-	    :param str bucket: The S3 bucket to upload file to
-	    :param str prefix: The prefix to be added to the file name
-	    :raises ClientError: S3 client exception
+		:param str directory: The directory the archive is being extracted to
+		:param str member_name: The name of the archive member
+		:param bool is_dir: True if the archive member is a directory
+		"""
+		member_dir = member_name if is_dir else os.path.dirname(member_name)
+		root = os.path.realpath(directory)
+		path = os.path.realpath(os.path.join(root, member_dir))
+
+		if path.startswith(root + os.sep):
+			os.makedirs(path, exist_ok=True)
+
+
+	def _iter_ttl(self, directory, recursive=True):
+		"""Helper function that will yield the paths of all .ttl files in a directory. Hidden
+		files and directories are skipped, matching the behavior of glob.
+
+		:param str directory: The directory to search for .ttl files
+		:param bool recursive: If True, subdirectories are searched as well
+		:returns: Generator of .ttl file paths
+		:rtype: generator
+		"""
+		with os.scandir(directory) as it:
+			for entry in it:
+				if entry.name.startswith('.'):
+					continue
+
+				if entry.is_dir(follow_symlinks=False):
+					if recursive:
+						yield from self._iter_ttl(entry.path)
+				elif entry.name.endswith('.ttl'):
+					yield entry.path
+
+
+	def _upload_files_to_s3(self, filepaths, bucket, prefix=None):
+	    """Helper function to upload multiple files to S3 bucket with specified prefix. All
+	    uploads are submitted to the shared transfer manager before waiting on any of them.
+
+	    :param list filepaths: The local paths of the files to be uploaded
+	    :param str bucket: The S3 bucket to upload files to
+	    :param str prefix: The prefix to be added to the file names
+	    :returns: The S3 object keys of the files that were uploaded successfully
+	    :rtype: list
 	    """
-	    s3_client = self.session.client('s3')
+	    futures = []
+	    s3_objects = []
 
-	    try:
+	    for filepath in filepaths:
 	        if prefix is not None:
 	            s3_object = '/'.join([prefix, Path(filepath).name])
 	        else:
 	            s3_object = Path(filepath).name
 
 	        logging.info("Uploading %s to bucket %s", s3_object, bucket)
-	        s3_client.upload_file(str(filepath), bucket, s3_object)
+	        futures.append((s3_object, self.transfer_manager.upload(str(filepath), bucket, s3_object)))
 
-	    except ClientError as e:
-	        logging.error(e)
+	    # wait on every upload so a failure does not leave the others unchecked
+	    for s3_object, future in futures:
+	        try:
+	            future.result()
+	            s3_objects.append(s3_object)
+
+	        except Exception as e:
+	            logging.error("Unable to upload %s to bucket %s: %s", s3_object, bucket, e)
+
+	    return s3_objects
+
+
+	def _delete_s3_objects(self, bucket, s3_objects):
+		"""Helper function to delete a list of objects from an S3 bucket. Objects are
+		removed in batches of 1000, the maximum allowed by a single delete request.
+
+		:param str bucket: The S3 bucket to delete objects from
+		:param list s3_objects: The S3 object keys to delete
+		:returns: True if all objects were deleted, False otherwise. S3 client exceptions are
+			logged and reported as False
+		:rtype: bool
+		"""
+		deleted = True
+
+		try:
+			for i in range(0, len(s3_objects), 1000):
+				batch = s3_objects[i:i + 1000]
+				logging.info("Deleting %s objects from bucket %s", len(batch), bucket)
+				response = self.s3_client.delete_objects(
+					Bucket=bucket,
+					Delete={
+						'Objects': [ {'Key': k} for k in batch ]
+					}
+				)
+
+				# failures for individual keys are reported in the response rather than raised
+				for error in response.get('Errors', []):
+					logging.error("Unable to delete %s from bucket %s: %s", error.get('Key'), bucket, error.get('Message'))
+					deleted = False
+
+		except ClientError as e:
+			logging.error(e)
+			deleted = False
+
+		return deleted
 
 
 	def _get_submission_paths(self):
@@ -216,8 +342,7 @@ class Initialize:
 	    s3_bucket = path.parts[0]          
 	    s3_object = '/'.join(path.parts[1:])   
 	    file_name = path.name
-	    suffixes = path.suffixes
-	    file_ext = self._get_submission_extension()
+	    file_ext = self.s3_submission_archive_ext
 
 	    return s3_bucket, s3_object, file_name, file_ext
 
@@ -228,17 +353,11 @@ class Initialize:
 		:returns: The submission extension
 		:rtype: str
 		"""
-		path = Path(self.s3_submission_archive_path)
-		suffixes = path.suffixes
-
-		if len(suffixes) > 1 and suffixes[-1] == '.gz':
-		    file_ext = "".join([suffixes[-2], suffixes[-1]])
-		elif len(suffixes) > 1:
-		    file_ext = suffixes[-1]
-		elif len(suffixes) == 1:
-		    file_ext = suffixes[0]
+		for ext in self.VALID_EXTENSIONS:
+			if self.s3_submission_archive_path.endswith(ext):
+				return ext
 
-		return file_ext
+		return Path(self.s3_submission_archive_path).suffix
 
 
 	def _check_submission_extension(self):
@@ -248,12 +367,9 @@ class Initialize:
 
 		:raises ValueError: The submission extension type is invalid
 	    """
-	    file_ext = self._get_submission_extension()
-	    valid_ext = [".tar.gz", ".tgz", ".zip"]
-
 	    try:
 	        logging.info("Checking if submission %s is a valid archive type", self.s3_submission_archive_path)
-	        if file_ext not in valid_ext:
+	        if self.s3_submission_archive_ext not in self.VALID_EXTENSIONS:
 	            raise ValueError("Submission {0} is not a valid archive type. Submissions must be .tar.gz, .tgz, or .zip".format(self.s3_submission_archive_path))
 	    except ValueError as e:
 	        logging.error(e)
@@ -272,26 +388,27 @@ class Initialize:
 		path = Path(self.s3_submission_archive_path)
 		stem = path.stem
 
-		if self._get_submission_extension() == '.tar.gz':
+		if self.s3_submission_archive_ext == '.tar.gz':
 			return Path(stem).stem
 		else:
 			return stem
 
 
-	def _get_task_type(self, stem, run_id_path):
+	def _get_task_type(self, stem, run_id_path, run_id_dirs):
 		"""Function will determine the task type of the submission based on the naming 
 		convention of the stem.
 
 		:param str stem: The stem of the submission
 		:param str run_id_path: The local directory path containing the downloaded contents of
 			the submission
+		:param set run_id_dirs: The names of the immediate subdirectories of the run id path
 		:returns The task type enum of the submission stems
 		:rtype: Enum
 		"""
 		delim_count = stem.count('.')
 
 		if delim_count == 0:
-			if not self._check_nist_directory(run_id_path):
+			if not self._check_nist_directory(run_id_dirs):
 				err = "Invalid Task 1 submission format. Unable to locate required NIST directory in submission"
 				self._publish_init_failure(err)
 				raise ValueError(err)
@@ -309,7 +426,7 @@ class Initialize:
 				raise ValueError(err)
 			
 		elif delim_count == 1:
-			if not self._check_nist_directory(run_id_path):
+			if not self._check_nist_directory(run_id_dirs):
 				err = "Invalid Task 2 submission format. Unable to locate required NIST directory in submission"
 				self._publish_init_failure(err)
 				raise ValueError(err)
@@ -346,7 +463,7 @@ class Initialize:
 		:returns: The full path of the run ID directory
 		:rtype: str
 		"""
-		dir_list = [ name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name)) ]
+		dir_list = list(self._get_subdirectory_names(directory))
 
 		# We have noticed that some submissions created on a Mac include an invisible __MACOSX directory. This 
 		# check is to remove this from the list if it exists essentially ignoring it. 
@@ -368,12 +485,13 @@ class Initialize:
 			raise ValueError(err)
 
     
-	def _validate_and_upload(self, run_id_path, task, prefix):
+	def _validate_and_upload(self, run_id_path, run_id_dirs, task, prefix):
 		"""Validates directory structure of task type and uploads the contents to s3. Returns a dictionary
 		of jobs that need to be executed on batch with their corresponding s3 locations.
 
 		:param str run_id_path: The local directory path containing the downloaded contents of
 			the submission
+		:param set run_id_dirs: The names of the immediate subdirectories of the run id path
 		:param Task task: The task enum that representing the task type of the submission
 		:param str prefix: The prefix to append to all objects uploaded to the S3 bucket
 		:returns: List of dictionary objects representing the aws batch jobs that need to be executed
@@ -386,18 +504,18 @@ class Initialize:
 		if task == Task.oneA or task == Task.two:
 
 			# NIST directory required, do not upload INTER-TA if NIST does not exist
-			if not self._check_nist_directory(run_id_path):
+			if not self._check_nist_directory(run_id_dirs):
 				logging.error("Task {0} submission format is invalid. Could not locate NIST directory".format(str(task.value)))
 
 			else:
-				j = self._upload_formatted_submission(run_id_path, prefix, self.NIST, '/NIST/*.ttl', task)
+				j = self._upload_formatted_submission(run_id_path, prefix, self.NIST, '/NIST', task)
 
 				if j is not None:
 					jobs.append(j)
 
 				# INTER-TA directory **not required**
-				if self._check_inter_ta_directory(run_id_path):
-					j = self._upload_formatted_submission(run_id_path, prefix, self.INTER_TA, '/INTER-TA/*.ttl', task)
+				if self._check_inter_ta_directory(run_id_dirs):
+					j = self._upload_formatted_submission(run_id_path, prefix, self.INTER_TA, '/INTER-TA', task)
 
 					if j is not None:
 						jobs.append(j)
@@ -407,7 +525,7 @@ class Initialize:
 		elif task == Task.oneB:
 
 			# NIST directory required
-			if not self._check_nist_directory(run_id_path):
+			if not self._check_nist_directory(run_id_dirs):
 				logging.error("Task {0} submission format is invalid. Could not locate NIST directory".format(str(task.value)))
 			else:
 				hypothesis_dirs = self._get_ta3_hypothesis_dirs(run_id_path)
@@ -417,7 +535,7 @@ class Initialize:
 
 					# make a submission out of each hypothesis subdirectory
 					for d in hypothesis_dirs:
-						j = self._upload_formatted_submission(run_id_path, prefix + '-' + d, self.NIST, '/NIST/' + d + '/*.ttl', task)
+						j = self._upload_formatted_submission(run_id_path, prefix + '-' + d, self.NIST, '/NIST/' + d, task)
 
 						if j is not None:
 							jobs.append(j)
@@ -428,7 +546,10 @@ class Initialize:
 			return jobs
 
 		elif task == Task.three:
-			jobs.append(self._upload_formatted_submission(run_id_path, prefix, self.NIST_TA3, '/*.ttl', task))
+			j = self._upload_formatted_submission(run_id_path, prefix, self.NIST_TA3, '', task)
+
+			if j is not None:
+				jobs.append(j)
 
 			return jobs
 
@@ -436,7 +557,7 @@ class Initialize:
 			logging.error("Could not validate submission structure for invalid task %s", task)
 
 
-	def _upload_formatted_submission(self, directory, prefix, validation_type, ttl_glob, task):
+	def _upload_formatted_submission(self, directory, prefix, validation_type, ttl_subdirectory, task):
 		"""Function will locate all .ttl files within a submission subdirectory based on the validation 
 		type that was found in the get_task_type function and upload them to s3. Once all files have been 
 		uploaded, a dictionary object with information to pass into the aws batch job will be returned. 
@@ -445,7 +566,7 @@ class Initialize:
 			the submission
 		:param str prefix: The prefix to append to all objects uploaded to the S3 bucket
 		:param dict validation_type: The validation type that these files will be validated against
-		:param st ttl_glob: The glob expression to append in the glob statement to get the paths of all the
+		:param str ttl_subdirectory: The subdirectory to append to the directory to get the paths of all the
 			ttl files based on task type
 		:param Task task: The task enum that representing the task type of the submission
 		:param returns: The dictionary representation of the job, None if error occurred
@@ -456,7 +577,7 @@ class Initialize:
 		logging.info("Uploading Task %s .ttl files to %s", str(task.value), self.s3_validation_bucket + '/' + bucket_prefix)
 
 		# inspect the current directory for .ttl files
-		ttl_paths = (glob.glob(directory + ttl_glob))
+		ttl_paths = list(self._iter_ttl(directory + ttl_subdirectory, recursive=False))
 		ttls = [ Path(x).name for x in ttl_paths ] #update this to not be name but last path + name
 
 		if not self._check_for_duplicates(ttls):
@@ -464,8 +585,19 @@ class Initialize:
 			if len(ttls) == 0:
 				logging.error("No .ttl files found in Task %s submission", str(task.value))
 			else:
-				for path in ttl_paths:
-					self._upload_file_to_s3(path, self.s3_validation_bucket, bucket_prefix)
+				s3_objects = self._upload_files_to_s3(ttl_paths, self.s3_validation_bucket, bucket_prefix)
+
+				# remove any partially uploaded submission so no job is run against it
+				if len(s3_objects) != len(ttl_paths):
+					err = "Unable to upload all .ttl files in Task {0} submission to {1}, the {2} validation job will not be submitted".format(
+						str(task.value), self.s3_validation_bucket + '/' + bucket_prefix, validation_type['description'])
+
+					if not self._delete_s3_objects(self.s3_validation_bucket, s3_objects):
+						err += ". Some uploaded files could not be removed from {0}".format(self.s3_validation_bucket + '/' + bucket_prefix)
+
+					logging.error(err)
+					self._publish_init_failure(err)
+					return None
 
 				# create the batch job information
 				job['worker'] = {
@@ -547,21 +679,36 @@ class Initialize:
 		:returns: True if duplicates were found, False otherwise
 		:rtype: bool
 		"""
-		if len(ttls) != len(set(ttls)):
-			logging.error("Duplicate files with .ttl extension found in submission")
-			return True
+		seen = set()
+		for ttl in ttls:
+			if ttl in seen:
+				logging.error("Duplicate files with .ttl extension found in submission")
+				return True
+			seen.add(ttl)
 		return False
 		
 
-	def _check_nist_directory(self, directory):
+	def _get_subdirectory_names(self, directory):
+		"""Helper function that will return the names of all immediate subdirectories
+		of the passed in directory using a single directory scan.
+
+		:param str directory: The directory to scan
+		:returns: The set of subdirectory names
+		:rtype: set
+		"""
+		with os.scandir(directory) as it:
+			return { entry.name for entry in it if entry.is_dir() }
+
+
+	def _check_nist_directory(self, directories):
 		"""Helper function that will determine if NIST directory exists as an 
-		immediate subdirectory of the passed in directory.
+		immediate subdirectory of the run id directory.
 
-		:param str directory: The directory to validate against
+		:param set directories: The names of the immediate subdirectories to validate against
 		:returns: True if directory exists, False otherwise
 		:rtype: bool
 		"""
-		return os.path.exists(directory + '/NIST')
+		return 'NIST' in directories
 
 
 	def _check_nist_directory_has_ttl(self, directory):
@@ -591,15 +738,15 @@ class Initialize:
 		return True
 
 
-	def _check_inter_ta_directory(self, directory):
+	def _check_inter_ta_directory(self, directories):
 		"""Helper function that will determine if INTER-TA directory exists as
-		an immediate subdirectory of the passed in directory.
+		an immediate subdirectory of the run id directory.
 
-		:param str directory: The directory to validate against
+		:param set directories: The names of the immediate subdirectories to validate against
 		:returns: True if directory exists, False otherwise
 		:rtype: bool
 		"""
-		return os.path.exists(directory + '/INTER-TA')
+		return 'INTER-TA' in directories
 
 
 	def _get_ta3_hypothesis_dirs(self, directory):
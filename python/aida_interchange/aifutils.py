@@ -1,4 +1,6 @@
+import itertools
 import json
+import os
 import uuid
 
 from abc import ABCMeta, abstractmethod
@@ -12,6 +14,22 @@ A convenient interface for creating simple AIF graphs.
 More complicated graphs will require direct manipulation of the RDF
 """
 
+# blank node IDs are a random per-process prefix followed by a counter, so creating a
+# blank node does not require a uuid4 call. The prefix keeps IDs from graphs built in
+# different processes from colliding when merged, and is replaced in forked children,
+# which would otherwise inherit both the prefix and the counter position.
+_BNODE_PREFIX = 'N' + uuid.uuid4().hex
+_BNODE_SERIAL_NUMBER = itertools.count().__next__
+
+
+def _reset_bnode_prefix():
+    global _BNODE_PREFIX
+    _BNODE_PREFIX = 'N' + uuid.uuid4().hex
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_bnode_prefix)
+
 
 def make_graph():
     """
@@ -352,16 +370,19 @@ def mark_boundingbox(g, to_mark_on, boundingbox):
     :param Bounding_Box boundingbox: A rectangular box
         within the image that bounds the justification
     """
-    bounding_box_resource = BNode()
+    upper_left_x, upper_left_y = boundingbox.upper_left
+    lower_right_x, lower_right_y = boundingbox.lower_right
+
+    bounding_box_resource = _make_blank_node()
     g.add((bounding_box_resource, RDF.type, AIDA_ANNOTATION.BoundingBox))
     g.add((bounding_box_resource, AIDA_ANNOTATION.boundingBoxUpperLeftX,
-           Literal(boundingbox.upper_left[0], datatype=XSD.int)))
+           Literal(upper_left_x, datatype=XSD.int)))
     g.add((bounding_box_resource, AIDA_ANNOTATION.boundingBoxUpperLeftY,
-           Literal(boundingbox.upper_left[1], datatype=XSD.int)))
+           Literal(upper_left_y, datatype=XSD.int)))
     g.add((bounding_box_resource, AIDA_ANNOTATION.boundingBoxLowerRightX,
-           Literal(boundingbox.lower_right[0], datatype=XSD.int)))
+           Literal(lower_right_x, datatype=XSD.int)))
     g.add((bounding_box_resource, AIDA_ANNOTATION.boundingBoxLowerRightY,
-           Literal(boundingbox.lower_right[1], datatype=XSD.int)))
+           Literal(lower_right_y, datatype=XSD.int)))
 
     g.add((to_mark_on, AIDA_ANNOTATION.boundingBox, bounding_box_resource))
 
@@ -683,7 +704,7 @@ def make_hypothesis(g, hypothesis_uri, hypothesis_content, system):
 
     hypothesis = _make_aif_resource(g, hypothesis_uri, AIDA_ANNOTATION.Hypothesis, system)
 
-    subgraph = BNode()
+    subgraph = _make_blank_node()
     g.add((subgraph, RDF.type, AIDA_ANNOTATION.Subgraph))
 
     for content in hypothesis_content:
@@ -750,10 +771,10 @@ def mark_as_mutually_exclusive(g, alternatives, system, none_of_the_above_prob):
     mutual_exclusion_assertion = _make_aif_resource(g, None, AIDA_ANNOTATION.MutualExclusion, system)
 
     for (edges_for_alternative, confidence) in alternatives.items():
-        alternative = BNode()
+        alternative = _make_blank_node()
         g.add((alternative, RDF.type, AIDA_ANNOTATION.MutualExclusionAlternative))
 
-        alternative_graph = BNode()
+        alternative_graph = _make_blank_node()
         g.add((alternative_graph, RDF.type, AIDA_ANNOTATION.Subgraph))
         for alt in edges_for_alternative:
             g.add((alternative_graph, AIDA_ANNOTATION.subgraphContains, alt))
@@ -846,7 +867,7 @@ def link_to_external_kb(g, to_link, external_kb_id, system, confidence):
     :returns: The created link assertion resource
     :rtype: rdflib.term.BNode
     """
-    link_assertion = BNode()
+    link_assertion = _make_blank_node()
     g.add((to_link, AIDA_ANNOTATION.link, link_assertion))
     g.add((link_assertion, RDF.type, AIDA_ANNOTATION.LinkAssertion))
     g.add((link_assertion, AIDA_ANNOTATION.linkTarget,
@@ -856,6 +877,19 @@ def link_to_external_kb(g, to_link, external_kb_id, system, confidence):
     return link_assertion
 
 
+def _make_blank_node():
+    """
+    Helper function to create a blank node with a unique ID.
+
+    This relies on the private _sn_gen and _prefix arguments of rdflib's BNode, which
+    are accepted by every rdflib release from 4.x through 7.x.
+
+    :returns: The created blank node
+    :rtype: rdflib.term.BNode
+    """
+    return BNode(_sn_gen=_BNODE_SERIAL_NUMBER, _prefix=_BNODE_PREFIX)
+
+
 def _make_aif_resource(g, uri, class_type, system):
     """
     Helper function to create an event, relation, justification, etc. in the system.
@@ -868,7 +902,7 @@ def _make_aif_resource(g, uri, class_type, system):
     :rtype: rdflib.term.BNode
     """
     if uri is None:
-        resource = BNode()
+        resource = _make_blank_node()
     else:
         resource = URIRef(uri)
     g.add((resource, RDF.type, class_type))